@@ -1,50 +1,116 @@
 import names
+import numpy as np
 
-from random import choice, random, randint
 from datetime import datetime, timedelta
 
 from src import config
 from src.models.data_models import Activity, User
 
 
-EMAILS = ['gmail.com', 'yandex.ru', 'yahoo.com', 'mail.ru', 'bing.com']
+EMAILS = ('gmail.com', 'yandex.ru', 'yahoo.com', 'mail.ru', 'bing.com')
+TLDS = ('.ru', '.com')
 
 
-def get_random_user() -> User:
+def load_names(filename: str) -> tuple[np.ndarray, np.ndarray]:
     """
-    Generate a random user
+    Load a names distribution file shipped with the names package
 
-    :return: generated user
-    :rtype: User
+    :param filename: path to the distribution file
+    :type filename: str
+    :return: names and their cumulative frequencies
+    :rtype: tuple[np.ndarray, np.ndarray]
     """
-    username, last = names.get_full_name().split()
-    email = username.lower() + last + str(randint(1960, 2010)) + '@'
-    registration = datetime.now() - timedelta(days=randint(90, 365 * 2), seconds=randint(0, 3600 * 24))
+    with open(filename) as name_file:
+        rows = [line.split() for line in name_file]
+    return np.array([row[0] for row in rows]), np.array([float(row[2]) for row in rows])
 
-    if random() < 0.8:
-        email += choice(EMAILS)
-    else:
-        email += username.lower() + choice(['.ru', '.com'])
 
-    return User(username=username, email=email, registration_date=registration)
+def sample_names(table: tuple[np.ndarray, np.ndarray], n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draw n names with the same weighting as names.get_name, but in a single vectorized pass
+
+    :param table: names and their cumulative frequencies
+    :type table: tuple[np.ndarray, np.ndarray]
+    :param n: amount of names
+    :type n: int
+    :param rng: random generator
+    :type rng: np.random.Generator
+    :return: drawn names
+    :rtype: np.ndarray
+    """
+    table_names, cumulative = table
+    indices = np.searchsorted(cumulative, rng.random(n) * 90, side='right')
+    return table_names[np.minimum(indices, table_names.size - 1)]
+
+
+MALE_NAMES = load_names(names.FILES['first:male'])
+FEMALE_NAMES = load_names(names.FILES['first:female'])
+LAST_NAMES = load_names(names.FILES['last'])
+
 
+def get_random_users(n: int, rng: np.random.Generator, now: datetime) -> list[User]:
+    """
+    Generate n random users, all random fields are drawn in bulk
 
-def get_random_activity(user: User) -> Activity:
+    :param n: amount of users to generate
+    :type n: int
+    :param rng: random generator
+    :type rng: np.random.Generator
+    :param now: current time
+    :type now: datetime
+    :return: generated users
+    :rtype: list[User]
+    """
+    years = rng.integers(1960, 2011, n)
+    days = rng.integers(90, 365 * 2 + 1, n)
+    seconds = rng.integers(0, 3600 * 24 + 1, n)
+    common_domain = rng.random(n) < 0.8
+    domains = rng.choice(EMAILS, n)
+    tlds = rng.choice(TLDS, n)
+    first_names = np.where(rng.random(n) < 0.5, sample_names(MALE_NAMES, n, rng), sample_names(FEMALE_NAMES, n, rng))
+    last_names = sample_names(LAST_NAMES, n, rng)
+
+    users = []
+    for first_name, last_name, year, day, second, common, domain, tld in zip(
+        first_names.tolist(), last_names.tolist(), years.tolist(), days.tolist(), seconds.tolist(),
+        common_domain.tolist(), domains.tolist(), tlds.tolist()
+    ):
+        username, last = first_name.capitalize(), last_name.capitalize()
+        lower = username.lower()
+        email = f'{lower}{last}{year}@{domain}' if common else f'{lower}{last}{year}@{lower}{tld}'
+        registration = now - timedelta(days=day, seconds=second)
+        users.append(User(username=username, email=email, registration_date=registration))
+    return users
+
+
+def get_random_activities(users: list[User], a: int, rng: np.random.Generator, now: datetime) -> list[Activity]:
     """
-    Generate random activity for given user.
-    Generated date is in the range [registration date, now]
+    Generate from 1 to a random activities for each given user.
+    Generated dates are in the range [registration date, now]
 
-    :param user: the target
-    :type user: User
-    :return: generated activity
-    :rtype: Activity
+    :param users: the targets
+    :type users: list[User]
+    :param a: maximum number of activities per user
+    :type a: int
+    :param rng: random generator
+    :type rng: np.random.Generator
+    :param now: current time
+    :type now: datetime
+    :return: generated activities
+    :rtype: list[Activity]
     """
-    registration: datetime = user.registration_date
-    seconds = int((datetime.now() - registration).total_seconds())
-    return Activity(
-        user_id=user.id,
-        date=registration + timedelta(seconds=randint(0, seconds))
-    )
+    counts = rng.integers(1, a + 1, len(users))
+    spans = np.array([(now - user.registration_date).total_seconds() for user in users])
+    offsets = (rng.random(counts.sum()) * np.repeat(spans, counts)).astype(np.int64)
+
+    activities = []
+    start = 0
+    for user, count in zip(users, counts):
+        registration: datetime = user.registration_date
+        for offset in offsets[start:start + count]:
+            activities.append(Activity(user_id=user.id, date=registration + timedelta(seconds=int(offset))))
+        start += count
+    return activities
 
 
 def gen_data(n: int = 50, a: int = 100):
@@ -56,11 +122,15 @@ def gen_data(n: int = 50, a: int = 100):
     :param a: maximum number of activities per user
     :type a: int
     """
-    for i in range(n):
-        user = get_random_user().add()
-        for _ in range(randint(1, a)):
-            get_random_activity(user).add()
-        print(f'User: {user}; Added, activities generated!')
+    rng = np.random.default_rng()
+    now = datetime.now()
+    with config.SessionLocal() as session, session.begin():
+        users = get_random_users(n, rng, now)
+        session.add_all(users)
+        session.flush()
+        activities = get_random_activities(users, a, rng, now)
+        session.add_all(activities)
+    print(f'Users: {len(users)}; Activities: {len(activities)}; Added!')
 
 
 if __name__ == '__main__':
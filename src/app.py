@@ -1,10 +1,12 @@
 from flask import Flask
 from src.views.base import base
 from src.views.metrics import metrics
+from src.utils.json_provider import OrjsonProvider
 
 
 # App
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.register_blueprint(base, url_prefix='/')
 app.register_blueprint(metrics, url_prefix='/')
@@ -1,8 +1,10 @@
+import os
+
 from sqlalchemy import create_engine
 
 from src.models import data_models
 
 # Configs
 
-engine = create_engine('sqlite:///../local.db')
-data_models.setup(engine)
+engine = create_engine('sqlite:///../local.db', query_cache_size=1200)
+SessionLocal = data_models.setup(engine, debug=os.environ.get('SQL_DEBUG') == '1')
@@ -1 +1 @@
-from src.middleware import body_type
+from src.middleware import body_type, optimize
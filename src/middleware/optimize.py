@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import orjson
+
+from cachetools import TTLCache
+from flask import current_app, g, make_response, request, Response
+from typing import Callable
+from functools import wraps
+from threading import RLock
+
+from src.models import data_models
+
+
+# Successful GET responses: (method, path with query, payload hash) -> [mimetype, body, gzipped body or None].
+# Metric views read data_models.metrics_cache with the same ttl, so their responses may be up to 60 seconds old
+response_cache = TTLCache(maxsize=256, ttl=30)
+response_lock = RLock()
+
+
+def clear_cache():
+    """Drop all cached responses"""
+    with response_lock:
+        response_cache.clear()
+
+
+data_models.cache_resets.append(clear_cache)
+
+# Smaller bodies are sent as is, gzip header and trailer would eat the gain
+MIN_GZIP_SIZE = 500
+
+
+def optimize(view: Callable[[], ...]) -> Callable[[], ...]:
+    """
+    Decorator that caches successful GET responses for 30 seconds and gzips them for clients that accept it,
+    repeated requests with the same url and payload skip validation, the database and serialization.
+    Should be placed right below correct_body, responses are keyed by the parsed payload from flask.g.body
+
+    :param view: function to decorate
+    :rtype view: Callable[[], Response]
+    :return: wrapper
+    :rtype: Callable[[], Response]
+    """
+    @wraps(view)
+    def _optimize() -> ...:
+        if request.method != 'GET':
+            return view()
+
+        payload = orjson.dumps(g.body, option=orjson.OPT_SORT_KEYS)
+        key = (request.method, request.full_path, hashlib.blake2b(payload, digest_size=16).digest())
+        with response_lock:
+            entry = response_cache.get(key)
+        if entry is None:
+            response: Response = make_response(view())
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            entry = [response.mimetype, response.get_data(), None]
+            with response_lock:
+                response_cache[key] = entry
+
+        mimetype, body, compressed = entry
+        if len(body) < MIN_GZIP_SIZE:
+            return current_app.response_class(body, mimetype=mimetype)
+        if not request.accept_encodings['gzip']:
+            response = current_app.response_class(body, mimetype=mimetype)
+        else:
+            if compressed is None:
+                compressed = entry[2] = gzip.compress(body, compresslevel=6)
+            response = current_app.response_class(compressed, mimetype=mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return _optimize
@@ -1,27 +1,78 @@
 from __future__ import annotations
 
-from sqlalchemy import DateTime, String, Engine, exc, ColumnElement, func, ForeignKey, ForeignKeyConstraint
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session, relationship
-
-from typing import TypeVar
+from sqlalchemy import DateTime, String, Engine, exc, ColumnElement, func, ForeignKey, ForeignKeyConstraint, Index, \
+    Integer, cast, event, case, insert, update, delete, inspect, text, or_, \
+    and_, select, Row, Select, Column, bindparam
+from sqlalchemy.engine.interfaces import CacheStats, ExecutionContext
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session, relationship, sessionmaker, \
+    validates
+
+import logging
+import numpy as np
+
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from threading import RLock
+from typing import Callable, TypeVar
+from itertools import groupby
+from operator import attrgetter, itemgetter
 from datetime import datetime, timedelta
 
 
+logger = logging.getLogger(__name__)
+
+# Results of metric queries, they scan the users table and are allowed to be up to 30 seconds old
+metrics_cache = TTLCache(maxsize=256, ttl=30)
+metrics_lock = RLock()
+
+# Functions that drop other caches of query results, called together with metrics_cache.clear on engine change
+cache_resets: list[Callable[[], None]] = []
+
+
 class Base(DeclarativeBase):
     """ A base model """
     _T = TypeVar('_T')
     _engine: Engine
+    _Session: sessionmaker[Session]
+    _cols: tuple[str, ...]
+    _get_all: attrgetter
+    _public_cols: tuple[str, ...]
+    _get_public: attrgetter
+    _public_columns: tuple[Column, ...]
+    _by_id: Select
     id: Mapped[int] = mapped_column(primary_key=True)
 
+    def __init_subclass__(cls, **kwargs):
+        """
+        Caches column names, getters of all and of public column values, public columns and a select by id statement
+        once the table is mapped. A subclass may set _public_cols to hide internal columns from to_dict and projections
+        """
+        super().__init_subclass__(**kwargs)
+        cls._cols = tuple(cls.__table__.columns.keys())
+        cls._get_all = attrgetter(*cls._cols)
+        cls._public_cols = cls.__dict__.get('_public_cols', cls._cols)
+        cls._get_public = attrgetter(*cls._public_cols)
+        cls._public_columns = tuple(cls.__table__.columns[col] for col in cls._public_cols)
+        cls._by_id = select(cls).where(cls.id == bindparam('id'))
+
     @classmethod
-    def set_engine(cls, engine: Engine):
+    def set_engine(cls, engine: Engine) -> sessionmaker[Session]:
         """
-        Sets a global engine
+        Sets a global engine and a session factory bound to it, cached results of the previous engine are dropped
 
         :param engine: given engine
         :type engine: Engine
+        :return: session factory
+        :rtype: sessionmaker[Session]
         """
         cls._engine = engine
+        cls._Session = sessionmaker(engine, expire_on_commit=False)
+        with metrics_lock:
+            metrics_cache.clear()
+        for reset in cache_resets:
+            reset()
+        return cls._Session
 
     def add(self) -> Base | None:
         """
@@ -30,15 +81,36 @@ class Base(DeclarativeBase):
         :return: Object if insertion is successful, otherwise None
         :rtype: T | None
         """
-        with Session(self._engine) as session:
+        values = self.__to_raw_dict()
+        if values['id'] is None:
+            del values['id']
+        with self._Session() as session:
             try:
-                session.add(self)
+                stmt = insert(type(self)).values(values).returning(type(self).id)
+                self.id = session.scalar(stmt)
                 session.commit()
-                session.refresh(self)
             except exc.IntegrityError:
                 return None
         return self
 
+    @classmethod
+    def bulk_add(cls: _T, instances: list[_T]) -> list[_T] | None:
+        """
+        Add a list of objects to table within a single transaction
+
+        :param instances: objects to insert
+        :type instances: list[T]
+        :return: inserted objects with filled ids if insertion is successful, otherwise None
+        :rtype: list[T] | None
+        """
+        with cls._Session() as session:
+            try:
+                session.add_all(instances)
+                session.commit()
+            except exc.IntegrityError:
+                return None
+        return instances
+
     @classmethod
     def get(cls: _T, element: ColumnElement) -> _T | None:
         """
@@ -49,7 +121,7 @@ class Base(DeclarativeBase):
         :return: the first row that satisfies condition
         :rtype: T | None
         """
-        with Session(cls._engine) as session:
+        with cls._Session() as session:
             try:
                 stmt = session.query(cls).filter(element)
                 return stmt.first()
@@ -57,6 +129,19 @@ class Base(DeclarativeBase):
                 pass
         return None
 
+    @classmethod
+    def get_by_id(cls: _T, _id: int) -> _T | None:
+        """
+        Get an object from a table by id, the statement is built once per class
+
+        :param _id: object id
+        :type _id: int
+        :return: object if exists
+        :rtype: T | None
+        """
+        with cls._Session() as session:
+            return session.execute(cls._by_id, {'id': _id}).scalar_one_or_none()
+
     def update(self) -> Base | None:
         """
         Updates a current object in table
@@ -64,10 +149,15 @@ class Base(DeclarativeBase):
         :return: itself or none if case of failure
         :rtype: T | None
         """
-        with Session(self._engine) as session:
+        with self._Session() as session:
             try:
-                stmt = session.query(type(self)).where(type(self).id == self.id)
-                stmt.update(self.__to_raw_dict())
+                values = self.__to_raw_dict()
+                del values['id']
+                stmt = update(type(self)) \
+                    .where(type(self).id == self.id) \
+                    .values(values) \
+                    .execution_options(synchronize_session=False)
+                session.execute(stmt)
                 session.commit()
             except exc.IntegrityError:
                 return None
@@ -83,60 +173,52 @@ class Base(DeclarativeBase):
         :return: True if at least on element is deleted, in other cases False
         :rtype: bool
         """
-        with Session(cls._engine) as session:
+        with cls._Session() as session:
             try:
-                deleted = session.query(cls).filter(element).delete()
+                stmt = delete(cls).where(element).execution_options(synchronize_session=False)
+                deleted = session.execute(stmt).rowcount
                 session.commit()
             except exc.IntegrityError:
                 return False
         return deleted > 0
 
-    def __to_raw_dict(self, to_str_int: bool = False) -> dict:
+    def __to_raw_dict(self) -> dict:
         """
         Converts object to dictionary
 
-        :param to_str_int: indicates that all fields would be converted to int or str
-        :type to_str_int: bool
         :return: object as dictionary
         :rtype: dict
         """
-        res = dict()
-        for column in self.__table__.columns.keys():
-            val = getattr(self, column)
-            if not isinstance(val, str | int) and to_str_int:
-                val = str(val)
-                if isinstance(val, datetime):
-                    val = val.strftime('%d-%m-%Y %H:%M:%S')
-            res[column] = val
-        return res
+        return dict(zip(self._cols, self._get_all(self)))
 
-    def to_dict(self) -> dict[str, str | int]:
+    def to_dict(self) -> dict:
         """
-        Converts object to dictionary, all fields are either int or str
+        Converts object to dictionary of public column values. Values are kept as is (dates are datetime),
+        the app json provider serializes them as strings, other callers should not expect a json-safe dictionary
 
         :return: object as dictionary
         :rtype: dict
         """
-        return self.__to_raw_dict(True)
+        return dict(zip(self._public_cols, self._get_public(self)))
 
     @classmethod
-    def pagination(cls: _T, page: int = 0, per_page: int = 10) -> list[_T]:
+    def pagination(cls, page: int = 0, per_page: int = 10) -> list[Row]:
         """
-        Perform pagination, extracting object from table
+        Perform pagination, extracting rows of public columns from table without building objects
 
         :param page: page number
         :type page: int
         :param per_page: object per page
         :type per_page: int
-        :return: list of taken objects
-        :rtype: list[T]
+        :return: list of taken rows
+        :rtype: list[Row]
         """
-        with Session(cls._engine) as session:
-            return session.query(cls) \
+        with cls._Session() as session:
+            stmt = select(*cls._public_columns) \
                 .order_by(cls.id) \
                 .offset(page * per_page) \
-                .limit(per_page) \
-                .all()
+                .limit(per_page)
+            return session.execute(stmt).all()
 
     @classmethod
     def drop_table(cls):
@@ -145,12 +227,12 @@ class Base(DeclarativeBase):
 
     def __repr__(self) -> str:
         """
-        Representation of object
+        Representation of object, all fields are either int or str
 
         :return: object as string
         :rtype: str
         """
-        return str(self.to_dict())
+        return str({column: val if isinstance(val, (str, int)) else str(val) for column, val in self.to_dict().items()})
 
     def __str__(self) -> str:
         """
@@ -166,12 +248,108 @@ class User(Base):
     """User class"""
     _T = TypeVar('_T')
     __tablename__ = 'users'
+    # Lets longest_names read the top rows from the index instead of sorting the whole table
+    __table_args__ = (Index('ix_users_username_length', text('length(username) DESC')),)
+    # email_domain only serves the email_domain metric and is not a part of the API
+    _public_cols = ('id', 'username', 'email', 'registration_date')
 
     username: Mapped[str] = mapped_column(String(50))
-    email: Mapped[str] = mapped_column(String(50))
-    registration_date: Mapped[datetime] = mapped_column(DateTime())
+    email: Mapped[str] = mapped_column(String(50), index=True)
+    email_domain: Mapped[str] = mapped_column(String(50), index=True)
+    registration_date: Mapped[datetime] = mapped_column(DateTime(), index=True)
+
+    @validates('email')
+    def __set_email_domain(self, _, email: str) -> str:
+        """
+        Keeps email_domain (everything after '@', whole email if there is no '@') in sync with email
+
+        :param email: new email
+        :type email: str
+        :return: the same email
+        :rtype: str
+        """
+        self.email_domain = email[email.find('@') + 1:]
+        return email
 
     @classmethod
+    def get_with_activity_by_months(cls: _T, element: ColumnElement, months: int = 12,
+                                    days_per_m: int = 30) -> tuple[_T | None, np.ndarray]:
+        """
+        Get the first user that satisfies condition together with his activities within a few last months,
+        both are fetched by a single query
+
+        :param element: condition, like User.id == something
+        :type element: ColumnElement
+        :param months: a time range in months
+        :type months: int
+        :param days_per_m: days per month
+        :type days_per_m: int
+        :return: user or None, number of activities per previous months
+        :rtype: tuple[User | None, np.ndarray]
+        """
+        now = datetime.now()
+        month = Activity.month_offset(now, days_per_m)
+        in_range = Activity.date.between(now - timedelta(days=months * days_per_m), now)
+        first_id = select(cls.id).where(element).limit(1).scalar_subquery()
+        with cls._Session() as session:
+            rows = session.query(cls, month, func.count(Activity.id)) \
+                .outerjoin(Activity, and_(Activity.user_id == cls.id, in_range)) \
+                .filter(cls.id == first_id) \
+                .group_by(cls.id, month) \
+                .all()
+
+        if not rows:
+            return None, np.zeros(months, dtype=np.int64)
+        return rows[0][0], Activity.counts_by_months([row[1:] for row in rows], months)
+
+    @classmethod
+    def get_many(cls: _T, ids: list[int]) -> list[_T]:
+        """
+        Get users with given ids by a single query, ordered by id
+
+        :param ids: user ids
+        :type ids: list[int]
+        :return: existing users
+        :rtype: list[User]
+        """
+        with cls._Session() as session:
+            return list(session.scalars(select(cls).where(cls.id.in_(ids)).order_by(cls.id)))
+
+    @classmethod
+    def get_many_with_activity_by_months(cls: _T, ids: list[int], months: int = 12,
+                                         days_per_m: int = 30) -> list[tuple[_T, np.ndarray]]:
+        """
+        Get users with given ids together with their activities within a few last months,
+        all of them are fetched by a single grouped query
+
+        :param ids: user ids
+        :type ids: list[int]
+        :param months: a time range in months
+        :type months: int
+        :param days_per_m: days per month
+        :type days_per_m: int
+        :return: existing users ordered by id, each with number of activities per previous months
+        :rtype: list[tuple[User, np.ndarray]]
+        """
+        now = datetime.now()
+        month = Activity.month_offset(now, days_per_m)
+        in_range = Activity.date.between(now - timedelta(days=months * days_per_m), now)
+        with cls._Session() as session:
+            rows = session.query(cls, month, func.count(Activity.id)) \
+                .outerjoin(Activity, and_(Activity.user_id == cls.id, in_range)) \
+                .filter(cls.id.in_(ids)) \
+                .group_by(cls.id, month) \
+                .order_by(cls.id) \
+                .all()
+
+        # Rows of one user are adjacent and share the same identity-mapped object
+        return [
+            (user, Activity.counts_by_months([row[1:] for row in group], months))
+            for user, group in groupby(rows, key=itemgetter(0))
+        ]
+
+    @classmethod
+    @cached(metrics_cache, key=lambda cls, days=7: hashkey('registered_last', days), lock=metrics_lock)
     def registered_last(cls, days: int = 7) -> int:
         """
         Amount of users registered at last n days
@@ -181,29 +359,32 @@ class User(Base):
         :return: result
         :rtype: int
         """
-        with Session(cls._engine) as session:
-            now = datetime.now()
-            return session.query(User) \
-                .filter(cls.registration_date.between(now - timedelta(days=days), now)) \
-                .count()
+        now = datetime.now()
+        threshold = now - timedelta(days=days)
+        with cls._Session() as session:
+            return session.query(func.count(cls.id)) \
+                .filter(cls.registration_date.between(threshold, now)) \
+                .scalar()
 
     @classmethod
-    def longest_names(cls: _T, top: int = 5) -> list[_T]:
+    @cached(metrics_cache, key=lambda cls, top=5: hashkey('longest_names', top), lock=metrics_lock)
+    def longest_names(cls, top: int = 5) -> list[Row]:
         """
-        List of users with the longest names
+        List of users with the longest names, as rows of public columns
 
         :param top: how many users to return
         :type top: int
         :return: users
-        :rtype: list[User]
+        :rtype: list[Row]
         """
-        with Session(cls._engine) as session:
-            return session.query(User) \
-                .order_by(func.char_length(User.username).desc()) \
-                .limit(top) \
-                .all()
+        with cls._Session() as session:
+            stmt = select(*cls._public_columns) \
+                .order_by(func.char_length(cls.username).desc()) \
+                .limit(top)
+            return session.execute(stmt).all()
 
     @classmethod
+    @cached(metrics_cache, key=lambda cls, endswith: hashkey('percent_emails_endswith', endswith), lock=metrics_lock)
     def percent_emails_endswith(cls, endswith: str) -> float:
         """
         Return a fraction of users that have email ends with a given suffix
@@ -213,46 +394,29 @@ class User(Base):
         :return: a fraction
         :rtype: float
         """
-        with Session(cls._engine) as session:
-            c_all = session.query(User).count()
-            c_endswith = session.query(User) \
-                .filter(cls.email.endswith(endswith)) \
-                .count()
-            return (c_endswith / c_all) if c_all else 0
+        # A suffix without '@' lies within the domain, so the short indexed column can be used
+        if '@' in endswith:
+            matches = cls.email.endswith(endswith)
+        else:
+            matches = or_(cls.email_domain == endswith, cls.email_domain.endswith(endswith))
 
-    @classmethod
-    def delete(cls, element: ColumnElement) -> bool:
-        """
-        Delete a user, with deletion all activities connected with him
-
-        :param element: condition
-        :type element: ColumnElement
-        :return: True if at least one object is deleted otherwise False
-        :rtype: bool
-        """
-        with Session(cls._engine) as session:
-            try:
-                ids = session.query(cls.id).filter(element)
-                session.query(Activity).filter(Activity.id.in_(ids)).delete()
-                deleted = session.query(cls).filter(element).delete()
-                session.commit()
-            except exc.IntegrityError:
-                return False
-        return deleted > 0
+        with cls._Session() as session:
+            return session.query(func.avg(case((matches, 1.0), else_=0.0))).scalar() or 0.0
 
 
 class Activity(Base):
     """Activity class"""
     _T = TypeVar('_T')
     __tablename__ = 'activities'
+    __table_args__ = (Index('ix_act_user_date', 'user_id', 'date'),)
 
     user_id: Mapped[int] = mapped_column(ForeignKey(User.id, ondelete='CASCADE'))
     date: Mapped[datetime] = mapped_column(DateTime())
 
     @classmethod
-    def get_activity_by_months(cls, user_id: int, months: int = 12, days_per_m: int = 30) -> list[int]:
+    def get_activity_by_months(cls, user_id: int, months: int = 12, days_per_m: int = 30) -> np.ndarray:
         """
-        Get list of number of activities within a few last months
+        Get array of numbers of activities within a few last months
 
         :param user_id: target user id
         :type user_id: int
@@ -261,48 +425,120 @@ class Activity(Base):
         :param days_per_m: days per month
         :type days_per_m: int
         :return: number of activities per previous months
-        :rtype: list[int]
-        """
-        with Session(cls._engine) as session:
-            res = []
-            now = datetime.now()
-            for i in range(months):
-                cur = now - timedelta(days=i * days_per_m)
-                prev = now - timedelta(days=(i + 1) * days_per_m)
-                res.append(
-                    session.query(cls.id)
-                    .filter(cls.date.between(prev, cur))
-                    .filter(cls.user_id == user_id).count()
-                )
-            return res
-
-    def add(self) -> Activity | None:
-        """
-        Add activity to the table, in case if user with connected id exists
-
-        :return: itself in case of success, otherwise None
-        :rtype: Activity | None
-        """
-        with Session(self._engine) as session:
-            if not session.query(User).filter(User.id == self.user_id).scalar():
-                return None
-            try:
-                session.add(self)
-                session.commit()
-                session.refresh(self)
-            except exc.IntegrityError:
-                return None
-        return self
+        :rtype: np.ndarray
+        """
+        now = datetime.now()
+        month = cls.month_offset(now, days_per_m)
+        with cls._Session() as session:
+            rows = session.query(month, func.count(cls.id)) \
+                .filter(cls.user_id == user_id) \
+                .filter(cls.date.between(now - timedelta(days=months * days_per_m), now)) \
+                .group_by(month) \
+                .all()
+        return cls.counts_by_months(rows, months)
+
+    @classmethod
+    def month_offset(cls, now: datetime, days_per_m: int) -> ColumnElement:
+        """
+        SQL expression with a number of whole months passed since activity date
+
+        :param now: current time
+        :type now: datetime
+        :param days_per_m: days per month
+        :type days_per_m: int
+        :return: labeled expression
+        :rtype: ColumnElement
+        """
+        return cast((func.julianday(now) - func.julianday(cls.date)) / days_per_m, Integer).label('month')
+
+    @staticmethod
+    def counts_by_months(rows: list[tuple[int | None, int]], months: int) -> np.ndarray:
+        """
+        Collect rows of (month offset, number of activities) into array of numbers per previous months
+
+        :param rows: grouped rows, offset is None for users without activities
+        :type rows: list[tuple[int | None, int]]
+        :param months: a time range in months
+        :type months: int
+        :return: number of activities per previous months
+        :rtype: np.ndarray
+        """
+        res = np.zeros(months, dtype=np.int64)
+        for i, count in rows:
+            if i is not None:
+                res[min(i, months - 1)] += count
+        return res
+
+
+SQLITE_PRAGMAS = (
+    'foreign_keys=ON',
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'mmap_size=268435456',
+    'cache_size=-65536',
+)
+
+
+def set_pragmas(dbapi_connection, _):
+    """
+    Configures a new sqlite connection: enforces ForeignKey constraints,
+    switches to WAL journal with fewer fsyncs and enables memory-mapped reads
+
+    :param dbapi_connection: raw DBAPI connection
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
+def upgrade_schema(engine: Engine):
+    """
+    Brings databases created by older versions up to date: adds and backfills users.email_domain
+    if the column does not exist and creates any missing indexes of all tables
+
+    :param engine: an engine
+    :type engine: Engine
+    """
+    columns = {column['name'] for column in inspect(engine).get_columns(User.__tablename__)}
+    with engine.begin() as connection:
+        if 'email_domain' not in columns:
+            connection.execute(text('ALTER TABLE users ADD COLUMN email_domain VARCHAR(50)'))
+            connection.execute(text("UPDATE users SET email_domain = substr(email, instr(email, '@') + 1)"))
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def warn_no_cache_key(connection, cursor, statement: str, parameters, context: ExecutionContext, executemany: bool):
+    """
+    Warns about statements that can not be stored in the compiled cache and are compiled on every execution
+
+    :param statement: executed SQL
+    :type statement: str
+    :param context: execution context
+    :type context: ExecutionContext
+    """
+    if context.compiled is not None and not context.isddl and context.cache_hit is CacheStats.NO_CACHE_KEY:
+        logger.warning('Statement is compiled without caching: %s', statement)
 
 
-def setup(engine: Engine):
+def setup(engine: Engine, debug: bool = False) -> sessionmaker[Session]:
     """
     Setup database
 
     :param engine: an engine
     :type engine: Engine
+    :param debug: warn about statements that miss the compiled cache, adds a hook to every execution
+    :type debug: bool
+    :return: session factory bound to the engine
+    :rtype: sessionmaker[Session]
     """
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', set_pragmas):
+        event.listen(engine, 'connect', set_pragmas)
+    if debug and not event.contains(engine, 'before_cursor_execute', warn_no_cache_key):
+        event.listen(engine, 'before_cursor_execute', warn_no_cache_key)
     Base.metadata.create_all(engine)
-    Base.set_engine(engine)
-    User.metadata.create_all(engine)
-    Activity.metadata.create_all(engine)
+    upgrade_schema(engine)
+    return Base.set_engine(engine)
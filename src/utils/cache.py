@@ -0,0 +1,58 @@
+from cachetools import TTLCache
+from threading import RLock
+from typing import Any, Hashable
+
+
+class ProbabilisticCache:
+    """
+    TTL cache that stores only a fraction p of the values offered to it.
+    An accumulator decides deterministically which values are stored: it is increased by p on every offer
+    and a value is kept each time it reaches 1. Keys queried repeatedly get cached soon,
+    while one-shot keys mostly do not take space
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, p: float = 0.3):
+        """
+        :param maxsize: maximum number of stored values
+        :type maxsize: int
+        :param ttl: time to live of a value in seconds
+        :type ttl: float
+        :param p: fraction of offered values to store
+        :type p: float
+        """
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._p = p
+        self._acc = 0.0
+        self._lock = RLock()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Get a stored value
+
+        :param key: key
+        :type key: Hashable
+        :return: value or None if it is not stored or expired
+        :rtype: Any | None
+        """
+        with self._lock:
+            return self._cache.get(key)
+
+    def offer(self, key: Hashable, value: Any):
+        """
+        Offer a computed value, it is stored with probability p
+
+        :param key: key
+        :type key: Hashable
+        :param value: value
+        :type value: Any
+        """
+        with self._lock:
+            self._acc += self._p
+            if self._acc >= 1:
+                self._acc -= 1
+                self._cache[key] = value
+
+    def clear(self):
+        """Drop all stored values"""
+        with self._lock:
+            self._cache.clear()
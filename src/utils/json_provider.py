@@ -0,0 +1,60 @@
+import orjson
+
+from datetime import date, time
+from flask import Response
+from flask.json.provider import JSONProvider
+from typing import Any
+
+
+def default(obj: Any) -> str:
+    """
+    Serializes values that are not handled by orjson itself,
+    dates keep the str() format (YYYY-MM-DD hh:mm:ss) instead of orjson RFC 3339
+
+    :param obj: value
+    :type obj: Any
+    :return: string representation
+    :rtype: str
+    """
+    if isinstance(obj, (date, time)):
+        return str(obj)
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider that serializes and parses with orjson instead of the standard json module"""
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """
+        Serialize data as JSON string
+
+        :param obj: data to serialize
+        :type obj: Any
+        :return: JSON string
+        :rtype: str
+        """
+        return orjson.dumps(obj, default=default, option=self.option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """
+        Deserialize data from JSON string or bytes
+
+        :param s: text or UTF-8 bytes
+        :type s: str | bytes
+        :return: deserialized data
+        :rtype: Any
+        """
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """
+        Serialize arguments as JSON and wrap them into response, bytes from orjson are passed as is
+
+        :return: response with application/json mimetype
+        :rtype: Response
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=default, option=self.option), mimetype='application/json'
+        )
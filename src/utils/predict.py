@@ -1,28 +1,50 @@
 import numpy as np
 
+from functools import lru_cache
 
-def predict_activity(last_activities: list[int]) -> float:
+
+@lru_cache(maxsize=None)
+def regression_weights(n: int) -> np.ndarray:
+    """
+    Weights of a prediction for n previous months. The least squares line through (i, activities[i]),
+    evaluated at the next month i = -1, is linear in activities, so it is a dot product with these weights
+
+    :param n: number of previous months
+    :type n: int
+    :return: read-only weights
+    :rtype: np.ndarray
+    """
+    x = np.arange(n, dtype=np.float64)
+    x_mean = x.mean()
+    x_dev = x - x_mean
+    x_var = x_dev.dot(x_dev)
+
+    weights = np.full(n, 1 / n)
+    if x_var:
+        weights -= x_dev * (x_mean + 1) / x_var
+    weights.flags.writeable = False
+    return weights
+
+
+def predict_activity(last_activities: np.ndarray | list[int]) -> float:
     """
     Predict amount of user visits based on previous activity
 
     :param last_activities: number of activities per previous months
-    :type last_activities: list[int]
+    :type last_activities: np.ndarray | list[int]
     :return: amount of visits
     :rtype: float
     """
-    a_mat = np.ones((len(last_activities), 2))
-    for i in range(len(last_activities)):
-        a_mat[i][0] = i
-    b_vec = np.linalg.pinv(a_mat).dot(np.array(last_activities))
-    return np.array([-1, 1]).dot(b_vec)
+    last_activities = np.asarray(last_activities)
+    return float(regression_weights(last_activities.size).dot(last_activities))
 
 
-def activity_prob(last_activities: list[int]) -> float:
+def activity_prob(last_activities: np.ndarray | list[int]) -> float:
     """
     Probability that user would keep his activity in the next month
 
     :param last_activities: number of activities per previous months
-    :type last_activities: list[int]
+    :type last_activities: np.ndarray | list[int]
     :return: probability of keeping activity
     :rtype: float
     """
@@ -32,4 +54,4 @@ def activity_prob(last_activities: list[int]) -> float:
     prob = 0 if prob < 0 else prob
     prob = 1 if prob > 1 else prob
 
-    return prob
+    return float(prob)
@@ -1,25 +1,39 @@
-from flask import Blueprint, jsonify, request, Response
+from flask import Blueprint, jsonify, g, Response
 from datetime import datetime
+from functools import lru_cache
+from sqlalchemy import ColumnElement, and_
 
 from src.models import data_models
 from src.middleware.body_type import correct_body, check_fields
+from src.middleware.optimize import optimize
+from src.utils.cache import ProbabilisticCache
 from src.utils.predict import activity_prob
 
 
 base = Blueprint(name='base', import_name=__name__)
+# Upper bound of ids in one /user/get_many request, each id is a bound parameter of the IN clause
+MAX_IDS = 1000
+activity_cache = ProbabilisticCache(maxsize=1024, ttl=60, p=0.3)
+data_models.cache_resets.append(activity_cache.clear)
 
 
-def to_datetime(date_str: str | None) -> datetime | None:
+@lru_cache(maxsize=1024)
+def to_datetime(date_str: str) -> datetime | None:
     """
-    Converts string to datetime
+    Converts non-empty string to datetime, recent conversions are cached
 
     :param date_str: input string
-    :type date_str: str | None
-    :return: converted datetime
+    :type date_str: str
+    :return: converted datetime or None if the format is wrong
     :rtype: datetime | None
     """
-    if not date_str:
-        return None
+    # Fast path: reorder a well-formed DD-MM-YYYY hh:mm:ss into ISO format and parse it in C
+    if len(date_str) == 19 and date_str[2] == date_str[5] == '-' and date_str[10] == ' ' \
+            and date_str[13] == date_str[16] == ':':
+        try:
+            return datetime.fromisoformat(f'{date_str[6:10]}-{date_str[3:5]}-{date_str[:2]} {date_str[11:]}')
+        except ValueError:
+            pass
     try:
         return datetime.strptime(date_str, '%d-%m-%Y %H:%M:%S')
     except ValueError:
@@ -35,14 +49,42 @@ def handle_datetime(date_str: str | None) -> tuple[datetime | None, Response | N
     :return: error response if occurs and converted datetime
     :rtype: tuple[Response | None, datetime | None]
     """
-    date: datetime | None = None
-    if date_str:
-        date = to_datetime(date_str)
-    if not date and date_str:
-        return date, jsonify(error=1, error_msg='registration_date should be in the format DD-MM-YYYY hh:mm:ss')
+    if not date_str:
+        return None, None
+    date = to_datetime(date_str)
+    if date is None:
+        return None, jsonify(error=1, error_msg='registration_date should be in the format DD-MM-YYYY hh:mm:ss')
     return date, None
 
 
+def user_filter(_id: int | None, username: str | None, email: str | None,
+                date: datetime | None) -> ColumnElement[bool]:
+    """
+    Builds a condition that matches users by all given fields
+
+    :param _id: user id
+    :type _id: int | None
+    :param username: username
+    :type username: str | None
+    :param email: email
+    :type email: str | None
+    :param date: registration date
+    :type date: datetime | None
+    :return: conjunction of conditions for given fields
+    :rtype: ColumnElement[bool]
+    """
+    conditions = []
+    if _id is not None:
+        conditions.append(data_models.User.id == _id)
+    if username:
+        conditions.append(data_models.User.username == username)
+    if email:
+        conditions.append(data_models.User.email == email)
+    if date:
+        conditions.append(data_models.User.registration_date == date)
+    return and_(*conditions)
+
+
 def get_now() -> datetime:
     """
     Get datetime without milliseconds
@@ -50,8 +92,7 @@ def get_now() -> datetime:
     :return: now
     :rtype: datetime
     """
-    now = datetime.now()
-    return datetime(now.year, now.month, now.day, now.hour, now.minute, now.second)
+    return datetime.now().replace(microsecond=0)
 
 
 @base.route('/echo', methods=['POST'])
@@ -63,7 +104,7 @@ def test() -> Response:
     :return: response
     :rtype: Response
     """
-    return jsonify(request.json)
+    return jsonify(g.body)
 
 
 @base.route('/user/add', methods=['PUT'])
@@ -76,7 +117,7 @@ def add_user() -> Response | tuple[Response, int]:
     :return: response
     :rtype: Response | tuple[Response, int]
     """
-    content: dict = request.json
+    content: dict = g.body
     username: str = content.get('username', None)
     email: str = content.get('email', None)
     registration_date: str | None = content.get('registration_date', None)
@@ -107,7 +148,7 @@ def get_user() -> Response | tuple[Response, int]:
     :return: response
     :rtype: Response | tuple[Response, int]
     """
-    content: dict = request.json
+    content: dict = g.body
     username: str | None = content.get('username', None)
     email: str | None = content.get('email', None)
     _id: int | None = content.get('id', None)
@@ -122,26 +163,61 @@ def get_user() -> Response | tuple[Response, int]:
     if error:
         return error, 400
 
-    if _id is not None:
-        user = data_models.User.get(data_models.User.id == _id)
-    elif username:
-        user = data_models.User.get(data_models.User.username == username)
-    elif email:
-        user = data_models.User.get(data_models.User.email == email)
+    element = user_filter(_id, username, email, date)
+    only_id = _id is not None and not (username or email or date)
+
+    # A cached probability makes the activity query unnecessary
+    prob = activity_cache.get(_id) if predict and only_id else None
+    if predict and prob is None:
+        user, last_activities = data_models.User.get_with_activity_by_months(element)
+    elif only_id:
+        user = data_models.User.get_by_id(_id)
     else:
-        user = data_models.User.get(data_models.User.registration_date == date)
+        user = data_models.User.get(element)
 
     if not user:
         return jsonify(error=3, error_msg='No such user!'), 400
 
     ret_dict = user.to_dict()
-    if predict is not None and predict:
-        activity = activity_prob(data_models.Activity.get_activity_by_months(user.id))
-        ret_dict['activity_prob'] = activity
+    if predict:
+        if prob is None:
+            prob = activity_prob(last_activities)
+            activity_cache.offer(user.id, prob)
+        ret_dict['activity_prob'] = prob
 
     return jsonify(ret_dict)
 
 
+@base.route('/user/get_many', methods=['GET'])
+@correct_body
+@check_fields(ids=list, predict=bool | None)
+def get_many_users() -> Response | tuple[Response, int]:
+    """
+    Get users by a list of ids in one request, missing ids are skipped
+
+    :return: response
+    :rtype: Response | tuple[Response, int]
+    """
+    content: dict = g.body
+    ids: list = content.get('ids')
+    predict: bool | None = content.get('predict', None)
+
+    if len(ids) > MAX_IDS:
+        return jsonify(error=1, error_msg=f'ids should contain at most {MAX_IDS} elements!'), 400
+    if not all(type(_id) is int for _id in ids):
+        return jsonify(error=1, error_msg='ids should be a list of integers!'), 400
+
+    if not predict:
+        return jsonify(users=[user.to_dict() for user in data_models.User.get_many(ids)])
+
+    users = []
+    for user, last_activities in data_models.User.get_many_with_activity_by_months(ids):
+        ret_dict = user.to_dict()
+        ret_dict['activity_prob'] = activity_prob(last_activities)
+        users.append(ret_dict)
+    return jsonify(users=users)
+
+
 @base.route('/user/update', methods=['POST'])
 @correct_body
 @check_fields(username=str | None, email=str | None, registration_date=str | None, id=int)
@@ -152,7 +228,7 @@ def update_user() -> Response | tuple[Response, int]:
     :return: response
     :rtype: Response | tuple[Response, int]
     """
-    content: dict = request.json
+    content: dict = g.body
     username: str | None = content.get('username', None)
     email: str | None = content.get('email', None)
     registration_date: str | None = content.get('registration_date', None)
@@ -163,7 +239,7 @@ def update_user() -> Response | tuple[Response, int]:
     if error:
         return error, 400
 
-    user = data_models.User.get(data_models.User.id == _id)
+    user = data_models.User.get_by_id(_id)
     if not user:
         return jsonify(error=3, error_msg='User has been deleted!'), 400
 
@@ -189,7 +265,7 @@ def delete_user() -> Response | tuple[Response, int]:
     :return: response
     :rtype: Response | tuple[Response, int]
     """
-    content: dict = request.json
+    content: dict = g.body
     username: str | None = content.get('username', None)
     email: str | None = content.get('email', None)
     registration_date: str | None = content.get('registration_date', None)
@@ -203,16 +279,7 @@ def delete_user() -> Response | tuple[Response, int]:
     if error:
         return error, 400
 
-    if _id is not None:
-        res = data_models.User.delete(data_models.User.id == _id)
-    elif username:
-        res = data_models.User.delete(data_models.User.username == username)
-    elif email:
-        res = data_models.User.delete(data_models.User.email == email)
-    else:
-        res = data_models.User.delete(data_models.User.registration_date == date)
-
-    if not res:
+    if not data_models.User.delete(user_filter(_id, username, email, date)):
         return jsonify(error=3, error_msg='User has been deleted!'), 400
 
     return jsonify(status='ok')
@@ -220,6 +287,7 @@ def delete_user() -> Response | tuple[Response, int]:
 
 @base.route('/user/all', methods=['GET'])
 @correct_body
+@optimize
 @check_fields(page=int | None, per_page=int | None)
 def all_users() -> Response | tuple[Response, int]:
     """
@@ -228,10 +296,10 @@ def all_users() -> Response | tuple[Response, int]:
     :return: response
     :rtype: Response | tuple[Response, int]
     """
-    content: dict = request.json
+    content: dict = g.body
     page = content.get('page', 0)
     per_page = content.get('per_page', 10)
 
-    users = [user.to_dict() for user in data_models.User.pagination(page, per_page)]
+    users = [row._asdict() for row in data_models.User.pagination(page, per_page)]
 
     return jsonify(users=users)
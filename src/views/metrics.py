@@ -1,7 +1,8 @@
-from flask import Blueprint, jsonify, request, Response
+from flask import Blueprint, jsonify, g, Response
 
 from src.models import data_models
 from src.middleware.body_type import correct_body, check_fields
+from src.middleware.optimize import optimize
 
 
 metrics = Blueprint(name='metrics', import_name=__name__)
@@ -9,6 +10,7 @@ metrics = Blueprint(name='metrics', import_name=__name__)
 
 @metrics.route('/user/last_registered', methods=['GET'])
 @correct_body
+@optimize
 @check_fields(last_n_days=int | None)
 def last_registered() -> Response:
     """
@@ -17,7 +19,7 @@ def last_registered() -> Response:
     :return: response
     :rtype: Response
     """
-    content: dict = request.json
+    content: dict = g.body
     last_n_days: int | None = content.get('last_n_days', None)
 
     res = data_models.User.registered_last(last_n_days or 7)
@@ -26,6 +28,7 @@ def last_registered() -> Response:
 
 @metrics.route('/user/longest_names', methods=['GET'])
 @correct_body
+@optimize
 @check_fields(top_n=int | None)
 def longest_names() -> Response:
     """
@@ -34,15 +37,16 @@ def longest_names() -> Response:
     :return: response
     :rtype: Response
     """
-    content: dict = request.json
+    content: dict = g.body
     top_n: int | None = content.get('top_n', None)
 
-    longest = [user.to_dict() for user in data_models.User.longest_names(top_n or 5)]
+    longest = [row._asdict() for row in data_models.User.longest_names(top_n or 5)]
     return jsonify(result=longest)
 
 
 @metrics.route('/user/email_domain', methods=['GET'])
 @correct_body
+@optimize
 @check_fields(domain=str)
 def email_domain() -> Response:
     """
@@ -51,7 +55,7 @@ def email_domain() -> Response:
     :return: response
     :rtype: Response
     """
-    content: dict = request.json
+    content: dict = g.body
     domain: str = content.get('domain')
 
     fraction = data_models.User.percent_emails_endswith(domain)
@@ -1,6 +1,8 @@
 import unittest
 import os
 
+from datetime import datetime
+
 from sqlalchemy import create_engine, Engine
 
 from src.app import app
@@ -29,14 +31,18 @@ class TestBase(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls) -> None:
-        os.remove('test.db')
         cls.engine.dispose()
+        os.remove('test.db')
 
     def test_payload_check(self):
         ret = self.app.post('/echo')
         self.assertTrue(ret.is_json)
         self.assertEqual(ret.json.get('error_msg', None), 'Incorrect body type, should be a json!')
 
+        ret = self.app.post('/echo', data='{', content_type='application/json')
+        self.assertEqual(ret.status_code, 400)
+        self.assertEqual(ret.json.get('error_msg', None), 'Incorrect body, should be a valid json!')
+
     def test_echo(self):
         data = {'msg': 'Hello!'}
         ret = self.app.post('/echo', json=data)
@@ -62,6 +68,7 @@ class TestBase(unittest.TestCase):
         ret: dict = self.app.put('/user/add', json=self.user_1).json
         self.assertEqual(ret.get('username', None), self.user_1.get('username'))
         self.assertEqual(ret.get('email', None), self.user_1.get('email'))
+        self.assertNotIn('email_domain', ret)
 
         ret: dict = self.app.put('/user/add', json=self.user_inv_3).json
         self.assertEqual(ret.get('error_msg', None), 'user with given id is already present in the table!')
@@ -75,6 +82,10 @@ class TestBase(unittest.TestCase):
         self.assertEqual(ret.get('username', None), self.user_3.get('username'))
         self.assertEqual(ret.get('email', None), self.user_3.get('email'))
 
+    def test_add_activity_no_user(self):
+        activity = data_models.Activity(user_id=-1, date=datetime.now()).add()
+        self.assertIsNone(activity)
+
     def test_get(self):
         ret: dict = self.app.get('/user/get', json=dict()).json
         self.assertEqual(ret.get('error_msg', None), 'at least one field should be specified!')
@@ -86,14 +97,29 @@ class TestBase(unittest.TestCase):
         self.assertEqual(ret.get('username', None), self.user_1.get('username'))
         self.assertEqual(ret.get('email', None), self.user_1.get('email'))
 
+        ret: dict = self.app.get('/user/get', json={'username': self.user_1.get('username'), 'email': 'd'}).json
+        self.assertEqual(ret.get('error_msg', None), 'No such user!')
+
     def test_get_prob(self):
         users = data_models.User.pagination()
         for user in users:
             data_models.Activity(user_id=user.id, date=user.registration_date).add()
 
-            ret: dict = self.app.get('/user/get', json={'id': user.id, 'predict': True}).json
-            self.assertTrue(ret.get('activity_prob', None) is not None)
-            self.assertTrue(ret.get('activity_prob') > 0)
+        ids = [user.id for user in users]
+        ret: dict = self.app.get('/user/get_many', json={'ids': ids + [-1], 'predict': True}).json
+        self.assertEqual([user.get('id') for user in ret.get('users')], ids)
+        for user in ret.get('users'):
+            self.assertTrue(user.get('activity_prob', None) is not None)
+            self.assertTrue(user.get('activity_prob') > 0)
+
+        ret: dict = self.app.get('/user/get', json={'id': ids[0], 'predict': True}).json
+        self.assertTrue(ret.get('activity_prob') > 0)
+
+        ret: dict = self.app.get('/user/get_many', json={'ids': ['a']}).json
+        self.assertEqual(ret.get('error_msg', None), 'ids should be a list of integers!')
+
+        ret: dict = self.app.get('/user/get_many', json={'ids': list(range(1001))}).json
+        self.assertEqual(ret.get('error_msg', None), 'ids should contain at most 1000 elements!')
 
     def test_update(self):
         self.user_1['id'] = 1
@@ -113,15 +139,20 @@ class TestBase(unittest.TestCase):
         )
 
     def test_delete(self):
+        user = data_models.User.get(data_models.User.registration_date == datetime(2000, 1, 1))
+        data_models.Activity(user_id=user.id, date=user.registration_date).add()
+
         ret = self.app.delete('/user/delete', json={'registration_date': self.user_3['registration_date']}).json
         self.assertEqual(ret.get('status'), 'ok')
         self.assertTrue(
             not data_models.User.get(data_models.User.registration_date == self.user_3['registration_date'])
         )
+        self.assertIsNone(data_models.Activity.get(data_models.Activity.user_id == user.id))
 
     def test_pagination(self):
         ret: dict = self.app.get('/user/all', json=dict()).json
         self.assertEqual(len(ret.get('users')), 2)
+        self.assertEqual(set(ret.get('users')[0]), {'id', 'username', 'email', 'registration_date'})
 
         ret: dict = self.app.get('/user/all', json={'per_page': 1}).json
         self.assertEqual(len(ret.get('users')), 1)
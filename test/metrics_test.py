@@ -3,20 +3,10 @@ import os
 
 from sqlalchemy import create_engine, Engine
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 from src.app import app
 from src.models import data_models
-
-
-def get_now() -> datetime:
-    """
-    Get datetime without milliseconds
-
-    :return: now
-    :rtype: datetime
-    """
-    now = datetime.now()
-    return datetime(now.year, now.month, now.day, now.hour, now.minute, now.second)
+from src.views.base import get_now
 
 
 class TestMetrics(unittest.TestCase):
@@ -41,13 +31,12 @@ class TestMetrics(unittest.TestCase):
             cur['email'] = 'a' if i % 2 == 0 else 'b'
             users.append(cur)
 
-        for user in users:
-            data_models.User(**user).add()
+        data_models.User.bulk_add([data_models.User(**user) for user in users])
 
     @classmethod
     def tearDownClass(cls) -> None:
-        os.remove('test.db')
         cls.engine.dispose()
+        os.remove('test.db')
 
     def test_last_registered(self):
         res: dict = self.app.get('/user/last_registered', json=dict()).json
@@ -60,6 +49,7 @@ class TestMetrics(unittest.TestCase):
         res: dict = self.app.get('/user/longest_names', json=dict()).json
         self.assertEqual(len(res.get('result')), 5)
         self.assertEqual(res.get('result')[-1].get('username'), 'a')
+        self.assertNotIn('email_domain', res.get('result')[-1])
 
         res: dict = self.app.get('/user/longest_names', json={'top_n': 3}).json
         self.assertEqual(len(res.get('result')), 3)
@@ -0,0 +1,70 @@
+import gzip
+import unittest
+
+from flask import Flask, jsonify, g
+
+from src.middleware.body_type import correct_body
+from src.middleware.optimize import optimize, clear_cache, MIN_GZIP_SIZE
+from src.utils.json_provider import OrjsonProvider
+
+
+class TestOptimize(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        app = Flask(__name__)
+        app.json = OrjsonProvider(app)
+        cls.calls = 0
+
+        @app.route('/size', methods=['GET'])
+        @correct_body
+        @optimize
+        def size():
+            cls.calls += 1
+            if g.body.get('fail'):
+                return jsonify(error=1, error_msg='fail'), 400
+            return jsonify(result='a' * g.body.get('size', 1), calls=cls.calls)
+
+        cls.app = app.test_client()
+
+    def setUp(self) -> None:
+        clear_cache()
+
+    def test_cache_hit(self):
+        first = self.app.get('/size', json={'size': 10})
+        second = self.app.get('/size', json={'size': 10})
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.json.get('calls'), first.json.get('calls'))
+
+        third = self.app.get('/size', json={'size': 11})
+        self.assertEqual(third.json.get('calls'), first.json.get('calls') + 1)
+
+    def test_gzip(self):
+        ret = self.app.get('/size', json={'size': MIN_GZIP_SIZE}, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(ret.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', ret.headers.get('Vary', ''))
+        self.assertTrue(gzip.decompress(ret.data).startswith(b'{"result":"aaa'))
+
+        ret = self.app.get('/size', json={'size': MIN_GZIP_SIZE})
+        self.assertIsNone(ret.headers.get('Content-Encoding'))
+        self.assertEqual(len(ret.json.get('result')), MIN_GZIP_SIZE)
+
+        ret = self.app.get('/size', json={'size': 1}, headers={'Accept-Encoding': 'gzip'})
+        self.assertIsNone(ret.headers.get('Content-Encoding'))
+        self.assertEqual(ret.json.get('result'), 'a')
+
+    def test_errors_not_cached(self):
+        calls = self.calls
+        for _ in range(2):
+            ret = self.app.get('/size', json={'fail': True})
+            self.assertEqual(ret.status_code, 400)
+        self.assertEqual(self.calls, calls + 2)
+
+    def test_not_json_after_cached(self):
+        self.app.get('/size', json={})
+        ret = self.app.get('/size', data='{}', content_type='text/plain')
+        self.assertEqual(ret.status_code, 400)
+        self.assertEqual(ret.json.get('error_msg'), 'Incorrect body type, should be a json!')
+
+
+if __name__ == '__main__':
+    unittest.main()
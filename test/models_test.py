@@ -0,0 +1,62 @@
+import unittest
+import os
+import sqlite3
+
+from sqlalchemy import create_engine, inspect, Engine
+
+from src.models import data_models
+
+
+class TestUpgradeSchema(unittest.TestCase):
+    engine: Engine
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Schema and data of a database created before email_domain and the indexes were introduced
+        connection = sqlite3.connect('legacy.db')
+        connection.executescript('''
+            CREATE TABLE users (
+                id INTEGER NOT NULL PRIMARY KEY, username VARCHAR(50) NOT NULL,
+                email VARCHAR(50) NOT NULL, registration_date DATETIME NOT NULL
+            );
+            CREATE TABLE activities (
+                id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+                date DATETIME NOT NULL
+            );
+            INSERT INTO users VALUES (1, 'a', 'a@mail.ru', '2020-01-01 00:00:00.000000');
+            INSERT INTO users VALUES (2, 'b', 'b@gmail.com', '2020-01-01 00:00:00.000000');
+            INSERT INTO users VALUES (3, 'c', 'c@mail.com', '2020-01-01 00:00:00.000000');
+            INSERT INTO users VALUES (4, 'd', 'd', '2020-01-01 00:00:00.000000');
+        ''')
+        connection.close()
+
+        cls.engine = create_engine('sqlite:///legacy.db')
+        data_models.setup(cls.engine)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.engine.dispose()
+        os.remove('legacy.db')
+
+    def test_backfill(self):
+        self.assertEqual(data_models.User.get_by_id(1).email_domain, 'mail.ru')
+        self.assertEqual(data_models.User.get_by_id(4).email_domain, 'd')
+
+    def test_repr(self):
+        self.assertIn("'registration_date': '2020-01-01 00:00:00'", str(data_models.User.get_by_id(1)))
+
+    def test_indexes(self):
+        inspector = inspect(self.engine)
+        self.assertIn('ix_act_user_date', {index['name'] for index in inspector.get_indexes('activities')})
+        self.assertIn('ix_users_email_domain', {index['name'] for index in inspector.get_indexes('users')})
+
+    def test_percent_emails_endswith(self):
+        self.assertEqual(data_models.User.percent_emails_endswith('mail.ru'), 1 / 4)
+        self.assertEqual(data_models.User.percent_emails_endswith('.com'), 2 / 4)
+        self.assertEqual(data_models.User.percent_emails_endswith('@mail.com'), 1 / 4)
+        self.assertEqual(data_models.User.percent_emails_endswith('c@mail.com'), 1 / 4)
+        self.assertEqual(data_models.User.percent_emails_endswith('@yandex.ru'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
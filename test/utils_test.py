@@ -0,0 +1,38 @@
+import unittest
+
+from sqlalchemy import create_engine
+
+from src.models import data_models
+from src.utils.cache import ProbabilisticCache
+from src.views.base import activity_cache
+
+
+class TestProbabilisticCache(unittest.TestCase):
+    def test_store_rate(self):
+        cache = ProbabilisticCache(maxsize=100, ttl=60, p=0.3)
+        for key in range(30):
+            cache.offer(key, key)
+        stored = [key for key in range(30) if cache.get(key) is not None]
+        # About one offer in 1 / p is stored, the exact count depends on float rounding of the accumulator
+        self.assertAlmostEqual(len(stored), 9, delta=1)
+        self.assertEqual(stored[:2], [3, 6])
+
+    def test_falsy_value(self):
+        cache = ProbabilisticCache(p=1)
+        cache.offer('key', 0.0)
+        self.assertEqual(cache.get('key'), 0.0)
+        self.assertIsNone(cache.get('other'))
+
+    def test_reset_on_engine_change(self):
+        for _ in range(4):
+            activity_cache.offer(-1, 0.5)
+        self.assertEqual(activity_cache.get(-1), 0.5)
+
+        engine = create_engine('sqlite://')
+        data_models.Base.set_engine(engine)
+        self.assertIsNone(activity_cache.get(-1))
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()